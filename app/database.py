@@ -3,53 +3,120 @@ Database module for managing local ROM hash cache
 """
 import sqlite3
 import hashlib
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator, Iterable
 import logging
 
 logger = logging.getLogger(__name__)
 
+# The background writer commits queued ROMs every this many rows, or this
+# many seconds after the first one arrived, whichever comes first
+WRITER_BATCH_SIZE = 256
+WRITER_FLUSH_INTERVAL = 0.1
+
+# How long a connection waits for another one's write lock
+BUSY_TIMEOUT_MS = 5000
+
+# Hashes per IN (...) lookup, under SQLite's default 999 bound parameters
+HASH_LOOKUP_CHUNK_SIZE = 900
+
 
 class Database:
+    # Insert a ROM, or update the existing row for the same path in place
+    # (keeping its id) rather than deleting and re-inserting it
+    _UPSERT_ROM_SQL = """
+        INSERT INTO local_roms 
+        (platform, file_name, file_path, file_size, sha1_hash, md5_hash, crc_hash, last_modified, scanned_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(file_path) DO UPDATE SET
+            platform = excluded.platform,
+            file_name = excluded.file_name,
+            file_size = excluded.file_size,
+            sha1_hash = excluded.sha1_hash,
+            md5_hash = excluded.md5_hash,
+            crc_hash = excluded.crc_hash,
+            last_modified = excluded.last_modified,
+            scanned_at = CURRENT_TIMESTAMP
+    """
+    
+    # sha1_hash is NULL for files only CRC-hashed by a quick scan
+    _LOCAL_ROMS_TABLE_SQL = """
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            platform TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            file_path TEXT NOT NULL UNIQUE,
+            file_size INTEGER NOT NULL,
+            sha1_hash TEXT,
+            md5_hash TEXT,
+            crc_hash TEXT,
+            scanned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_modified REAL
+        )
+    """
+    
     def __init__(self, db_path: str):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self.conn = None
+        # Serializes transactions on the shared connection across threads
+        self._write_lock = threading.RLock()
+        # Reads go through one connection per thread, so they never see rows
+        # from a transaction still open on the shared connection
+        self._readers = threading.local()
+        self._reader_conns = []
+        self._readers_lock = threading.Lock()
+        # Queue and thread behind enqueue_rom, started on first use
+        self._write_queue = queue.Queue()
+        self._writer_thread = None
+        # Guards starting the writer thread; kept apart from _write_lock so
+        # enqueue_rom never waits on a transaction
+        self._writer_start_lock = threading.Lock()
+        # Bumped after every write, so callers can tell when data changed
+        self._generation = 0
+        self._opened_at = time.time_ns()
         self._init_db()
     
     def _init_db(self):
         """Initialize database with required tables"""
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # Autocommit mode; multi-statement writes use explicit transactions
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
         self.conn.row_factory = sqlite3.Row
         
+        self._configure_connection(self.conn)
+        
         cursor = self.conn.cursor()
         
         # Table for local ROM files and their hashes
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS local_roms (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                platform TEXT NOT NULL,
-                file_name TEXT NOT NULL,
-                file_path TEXT NOT NULL UNIQUE,
-                file_size INTEGER NOT NULL,
-                sha1_hash TEXT NOT NULL,
-                md5_hash TEXT,
-                crc_hash TEXT,
-                scanned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_modified TIMESTAMP
-            )
-        """)
+        cursor.execute(self._LOCAL_ROMS_TABLE_SQL.format(table='IF NOT EXISTS local_roms'))
+        self._migrate_nullable_sha1()
         
         # Index for fast hash lookups
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_sha1 ON local_roms(sha1_hash)
         """)
         
+        # Index for per-platform listings (sorted by file name) and filename
+        # matches; it also covers plain platform filters, so the old
+        # platform-only index is dropped
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_platform_fname ON local_roms(platform, file_name)
+        """)
+        cursor.execute("DROP INDEX IF EXISTS idx_platform")
+        
+        # Index for CRC lookups of quick-scanned files
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_platform ON local_roms(platform)
+            CREATE INDEX IF NOT EXISTS idx_crc ON local_roms(crc_hash)
         """)
         
+        # Rescans look rows up by platform, and file_path lookups use its
+        # UNIQUE index, so an old (file_path, file_size) index only slows writes
+        cursor.execute("DROP INDEX IF EXISTS idx_path_size")
+        
         # Table for scan metadata
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS scan_history (
@@ -61,104 +128,300 @@ class Database:
             )
         """)
         
-        self.conn.commit()
         logger.info(f"Database initialized at {self.db_path}")
     
-    def add_local_rom(self, platform: str, file_path: str, file_name: str, 
-                      file_size: int, sha1_hash: str, md5_hash: str = None, 
-                      crc_hash: str = None, last_modified: datetime = None):
-        """Add or update a local ROM file"""
-        cursor = self.conn.cursor()
+    @staticmethod
+    def _configure_connection(conn: sqlite3.Connection):
+        """Apply the journal and cache settings every connection should use"""
+        # WAL journal with relaxed syncing, checkpointed every ~1000 pages,
+        # and a larger in-memory cache
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA wal_autocheckpoint=1000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    
+    def _migrate_nullable_sha1(self):
+        """Rebuild local_roms from databases where sha1_hash was NOT NULL"""
+        columns = {row['name']: row for row in self.conn.execute("PRAGMA table_info(local_roms)")}
+        if not columns['sha1_hash']['notnull']:
+            return
         
+        logger.info("Migrating local_roms to allow CRC-only rows")
+        names = ', '.join(columns)
+        # Indexes follow the renamed table and are dropped with it; _init_db
+        # recreates them on the new table
+        with self._bulk_transaction():
+            self.conn.execute("ALTER TABLE local_roms RENAME TO local_roms_old")
+            self.conn.execute(self._LOCAL_ROMS_TABLE_SQL.format(table='local_roms'))
+            self.conn.execute(f"INSERT INTO local_roms ({names}) SELECT {names} FROM local_roms_old")
+            self.conn.execute("DROP TABLE local_roms_old")
+    
+    def add_local_rom(self, platform: str, file_path: str, file_name: str, 
+                      file_size: int, sha1_hash: str = None, md5_hash: str = None, 
+                      crc_hash: str = None, last_modified: float = None):
+        """Add or update a local ROM file (last_modified is an epoch mtime)"""
         try:
-            cursor.execute("""
-                INSERT OR REPLACE INTO local_roms 
-                (platform, file_name, file_path, file_size, sha1_hash, md5_hash, crc_hash, last_modified, scanned_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            """, (platform, file_name, file_path, file_size, sha1_hash, md5_hash, crc_hash, last_modified))
-            
-            self.conn.commit()
+            cursor = self._execute_write(self._UPSERT_ROM_SQL, (
+                platform, file_name, file_path, file_size, sha1_hash, md5_hash, crc_hash, last_modified
+            ))
             return cursor.lastrowid
         except sqlite3.Error as e:
             logger.error(f"Error adding ROM to database: {e}")
             return None
     
+    def save_scan_results(self, platform: str, rows: List[Dict], removed_paths: List[str], duration: float):
+        """
+        Store a platform's rescan in a single transaction: upsert new or
+        changed ROMs, drop files that are gone and record the scan
+        """
+        with self._bulk_transaction():
+            self.conn.executemany(self._UPSERT_ROM_SQL, map(self._rom_params, rows))
+            self.conn.executemany("DELETE FROM local_roms WHERE file_path = ?", ((p,) for p in removed_paths))
+            self.conn.execute("""
+                INSERT INTO scan_history (platform, files_scanned, duration_seconds)
+                VALUES (?, ?, ?)
+            """, (platform, len(rows), duration))
+    
+    @staticmethod
+    def _rom_params(r: Dict) -> tuple:
+        """Parameters for _UPSERT_ROM_SQL from a ROM info dict"""
+        return (r['platform'], r['file_name'], r['file_path'], r['file_size'], r.get('sha1_hash'),
+                r.get('md5_hash'), r.get('crc_hash'), r.get('last_modified'))
+    
+    def _execute_write(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        """Run a single write statement, never inside another thread's transaction"""
+        with self._write_lock:
+            cursor = self.conn.execute(sql, params)
+            self._bump_generation()
+            return cursor
+    
+    @contextmanager
+    def _bulk_transaction(self):
+        """
+        Run a block of writes as one explicit transaction, keeping dirty
+        pages in memory until commit
+        """
+        with self._write_lock:
+            self.conn.execute("PRAGMA cache_spill=OFF")
+            self.conn.execute("BEGIN")
+            try:
+                yield
+                self.conn.execute("COMMIT")
+                self._bump_generation()
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            finally:
+                self.conn.execute("PRAGMA cache_spill=ON")
+    
+    def enqueue_rom(self, rom: Dict):
+        """
+        Queue a ROM info dict for the background writer thread, which
+        upserts queued ROMs in batches on its own connection. Never waits
+        on another write, so it can be called from the event loop.
+        """
+        if self._writer_thread is None:
+            with self._writer_start_lock:
+                if self._writer_thread is None:
+                    thread = threading.Thread(target=self._writer_loop, name='db-writer', daemon=True)
+                    thread.start()
+                    self._writer_thread = thread
+        self._write_queue.put(rom)
+    
+    def _reader(self) -> sqlite3.Connection:
+        """Return this thread's read connection, opening it on first use"""
+        conn = getattr(self._readers, 'conn', None)
+        if conn is None:
+            # close() may run on another thread, so allow it to close this one
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._configure_connection(conn)
+            with self._readers_lock:
+                self._reader_conns.append(conn)
+            self._readers.conn = conn
+        return conn
+    
+    def flush(self):
+        """Block until every queued ROM has been written"""
+        self._write_queue.join()
+    
+    def _writer_loop(self):
+        """Drain the write queue, committing in batches"""
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        # synchronous and the cache settings are per connection
+        self._configure_connection(conn)
+        pending = []
+        deadline = None
+        stopping = False
+        
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                rom = self._write_queue.get(timeout=timeout)
+            except queue.Empty:
+                rom = None
+            else:
+                if rom is None:
+                    # close() sentinel
+                    self._write_queue.task_done()
+                    stopping = True
+                else:
+                    pending.append(rom)
+                    if deadline is None:
+                        deadline = time.monotonic() + WRITER_FLUSH_INTERVAL
+            
+            if pending and (stopping or len(pending) >= WRITER_BATCH_SIZE or time.monotonic() >= deadline):
+                try:
+                    conn.execute("BEGIN")
+                    conn.executemany(self._UPSERT_ROM_SQL, map(self._rom_params, pending))
+                    conn.execute("COMMIT")
+                    self._bump_generation()
+                except sqlite3.Error as e:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    logger.error(f"Error writing {len(pending)} queued ROMs to database: {e}")
+                for _ in pending:
+                    self._write_queue.task_done()
+                pending = []
+                deadline = None
+        
+        conn.close()
+    
+    def _bump_generation(self):
+        """Note that a write was committed; the writer thread calls this too"""
+        with self._write_lock:
+            self._generation += 1
+    
+    @property
+    def data_version(self) -> str:
+        """Token that changes whenever this database's ROM data is written"""
+        return f"{self._opened_at}.{self._generation}"
+    
     def get_local_rom_by_hash(self, sha1_hash: str) -> Optional[Dict]:
         """Check if a ROM with this hash exists locally"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
+        row = self._reader().execute("""
             SELECT * FROM local_roms WHERE sha1_hash = ?
-        """, (sha1_hash,))
+        """, (sha1_hash,)).fetchone()
         
-        row = cursor.fetchone()
         if row:
             return dict(row)
         return None
     
-    def get_local_roms_by_platform(self, platform: str) -> List[Dict]:
-        """Get all local ROMs for a specific platform"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
+    def get_local_roms_by_hashes(self, sha1_hashes: Iterable[str]) -> Dict[str, Dict]:
+        """Look up local ROMs for many hashes at once, keyed by SHA1"""
+        sha1_hashes = list(sha1_hashes)
+        conn = self._reader()
+        found = {}
+        # Stay under SQLite's limit on bound parameters per statement
+        for start in range(0, len(sha1_hashes), HASH_LOOKUP_CHUNK_SIZE):
+            chunk = sha1_hashes[start:start + HASH_LOOKUP_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            for row in conn.execute(f"""
+                SELECT * FROM local_roms WHERE sha1_hash IN ({placeholders})
+            """, chunk):
+                found.setdefault(row['sha1_hash'], dict(row))
+        return found
+    
+    def iter_local_roms_by_platform(self, platform: str) -> Iterator[Dict]:
+        """Yield local ROMs for a specific platform one at a time"""
+        for row in self._reader().execute("""
             SELECT * FROM local_roms WHERE platform = ? ORDER BY file_name
-        """, (platform,))
+        """, (platform,)):
+            yield dict(row)
+    
+    def get_local_rom_by_platform_and_filename(self, platform: str, file_name: str) -> Optional[Dict]:
+        """Find a local ROM by its platform folder and file name"""
+        row = self._reader().execute("""
+            SELECT * FROM local_roms WHERE platform = ? AND file_name = ? LIMIT 1
+        """, (platform, file_name)).fetchone()
+        
+        if row:
+            return dict(row)
+        return None
+    
+    def get_local_roms_by_crc(self, crc_hash: str) -> List[Dict]:
+        """Get local ROMs whose CRC32 matches (candidates to confirm by SHA1)"""
+        rows = self._reader().execute("""
+            SELECT * FROM local_roms WHERE crc_hash = ?
+        """, (crc_hash,)).fetchall()
         
-        return [dict(row) for row in cursor.fetchall()]
+        return [dict(row) for row in rows]
+    
+    def set_sha1_hash(self, file_path: str, sha1_hash: str):
+        """Store the SHA1 of a ROM that was only CRC-hashed"""
+        self._execute_write("UPDATE local_roms SET sha1_hash = ? WHERE file_path = ?", (sha1_hash, file_path))
+    
+    def get_local_roms_by_platform(self, platform: str) -> List[Dict]:
+        """Get all local ROMs for a specific platform"""
+        return list(self.iter_local_roms_by_platform(platform))
+    
+    def iter_all_local_roms(self) -> Iterator[Dict]:
+        """Yield all local ROMs one at a time"""
+        for row in self._reader().execute("""
+            SELECT * FROM local_roms ORDER BY platform, file_name
+        """):
+            yield dict(row)
     
     def get_all_local_roms(self) -> List[Dict]:
         """Get all local ROMs"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT * FROM local_roms ORDER BY platform, file_name
-        """)
+        return list(self.iter_all_local_roms())
+    
+    def get_fingerprints(self, platform: str, require_sha1: bool = False) -> Dict[str, tuple]:
+        """
+        Get {file_path: (file_size, last_modified)} for a platform's ROMs
         
-        return [dict(row) for row in cursor.fetchall()]
+        With require_sha1, rows without a SHA1 (from a quick scan) get a
+        last_modified of None so a full scan rehashes them.
+        """
+        if require_sha1:
+            mtime = "CASE WHEN sha1_hash IS NULL THEN NULL ELSE last_modified END"
+        else:
+            mtime = "last_modified"
+        rows = self._reader().execute(f"""
+            SELECT file_path, file_size, {mtime} AS last_modified FROM local_roms WHERE platform = ?
+        """, (platform,))
+        
+        return {row['file_path']: (row['file_size'], row['last_modified']) for row in rows}
     
     def delete_local_rom(self, file_path: str):
         """Remove a ROM from the database (file was deleted)"""
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM local_roms WHERE file_path = ?", (file_path,))
-        self.conn.commit()
+        self._execute_write("DELETE FROM local_roms WHERE file_path = ?", (file_path,))
     
     def clear_platform(self, platform: str):
         """Clear all ROMs for a specific platform (before rescan)"""
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM local_roms WHERE platform = ?", (platform,))
-        self.conn.commit()
+        cursor = self._execute_write("DELETE FROM local_roms WHERE platform = ?", (platform,))
         logger.info(f"Cleared {cursor.rowcount} ROMs for platform {platform}")
     
     def add_scan_record(self, platform: str, files_scanned: int, duration: float):
         """Record a scan operation"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
+        self._execute_write("""
             INSERT INTO scan_history (platform, files_scanned, duration_seconds)
             VALUES (?, ?, ?)
         """, (platform, files_scanned, duration))
-        self.conn.commit()
     
     def get_scan_stats(self) -> Dict:
         """Get statistics about the local ROM collection"""
-        cursor = self.conn.cursor()
-        
+        conn = self._reader()
         # Total ROMs
-        cursor.execute("SELECT COUNT(*) as total FROM local_roms")
-        total = cursor.fetchone()['total']
+        total = conn.execute("SELECT COUNT(*) as total FROM local_roms").fetchone()['total']
         
         # ROMs by platform
-        cursor.execute("""
+        by_platform = [dict(row) for row in conn.execute("""
             SELECT platform, COUNT(*) as count 
             FROM local_roms 
             GROUP BY platform 
             ORDER BY count DESC
-        """)
-        by_platform = [dict(row) for row in cursor.fetchall()]
+        """)]
         
         # Last scan
-        cursor.execute("""
+        last_scan = conn.execute("""
             SELECT * FROM scan_history 
             ORDER BY scanned_at DESC 
             LIMIT 1
-        """)
-        last_scan = cursor.fetchone()
+        """).fetchone()
         if last_scan:
             last_scan = dict(last_scan)
         
@@ -170,6 +433,15 @@ class Database:
     
     def close(self):
         """Close database connection"""
+        with self._writer_start_lock:
+            if self._writer_thread is not None:
+                self._write_queue.put(None)
+                self._writer_thread.join()
+                self._writer_thread = None
+        with self._readers_lock:
+            for conn in self._reader_conns:
+                conn.close()
+            self._reader_conns.clear()
         if self.conn:
             self.conn.close()
             logger.info("Database connection closed")
@@ -3,14 +3,291 @@ ROM Scanner
 Scans local ROM directories and generates file hashes
 """
 import hashlib
+import math
+import mmap
+import multiprocessing
+import os
+import queue
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import List, Dict, Optional, Callable
-from datetime import datetime
+from typing import List, Dict, Optional, Callable, Iterator, Tuple
 import logging
 import time
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
+# Hashes computed when the caller does not ask for specific ones. Only SHA1
+# is indexed in the database and used for matching against ROMM.
+DEFAULT_ALGORITHMS = frozenset({'sha1'})
+
+# Hashes computed by each scan mode: 'quick' computes only the much cheaper
+# CRC32, and SHA1 is filled in later for files whose CRC matches ROMM
+SCAN_MODE_ALGORITHMS = {
+    'full': DEFAULT_ALGORITHMS,
+    'quick': frozenset({'crc'}),
+}
+
+# Read size used while hashing; large reads keep the loop in C for big ISOs
+READ_CHUNK_SIZE = 1 << 20
+
+# Files at least this big are read on a background thread while hashing,
+# so disk reads overlap with hash computation
+THREADED_READ_MIN_SIZE = 8 * READ_CHUNK_SIZE
+
+# Files at least this big are memory-mapped and hashed straight from the
+# page cache, in slices small enough to keep TLB pressure bounded
+MMAP_MIN_SIZE = 32 * 1024 * 1024
+MMAP_SLICE_SIZE = 16 * 1024 * 1024
+
+# Fewer new or changed files than this are hashed in-process; starting
+# spawned workers costs more than hashing a handful of files
+PROCESS_POOL_MIN_FILES = 8
+
+# hashlib.file_digest (Python 3.11+) runs the whole read/hash loop itself
+HAS_FILE_DIGEST = hasattr(hashlib, 'file_digest')
+
+# Oldest zlib whose crc32 uses the fast slice-by-8/PCLMUL code paths
+MIN_ZLIB_VERSION = (1, 2, 11)
+
+
+def _check_zlib_version():
+    """Warn if the linked zlib has a slow crc32 implementation"""
+    version = zlib.ZLIB_RUNTIME_VERSION
+    try:
+        parsed = tuple(int(part) for part in version.split('.')[:3])
+    except ValueError:
+        return
+    if parsed < MIN_ZLIB_VERSION:
+        logger.warning(f"zlib {version} is older than 1.2.11; CRC32 hashing will be slow. "
+                       "Consider building against zlib-ng")
+
+
+def _advise_sequential(fd: int):
+    """
+    Tell the kernel a file is about to be read once, start to finish, so it
+    reads ahead aggressively and does not keep the pages cached
+    """
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        elif fcntl is not None and hasattr(fcntl, 'F_RDAHEAD'):
+            # macOS equivalents
+            fcntl.fcntl(fd, fcntl.F_RDAHEAD, 1)
+            if hasattr(fcntl, 'F_NOCACHE'):
+                fcntl.fcntl(fd, fcntl.F_NOCACHE, 1)
+    except OSError:
+        pass
+
+
+def _advise_done(fd: int):
+    """Drop a fully hashed file from the page cache"""
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+
+def _read_blocks(f) -> Iterator[memoryview]:
+    """Yield a file's contents in READ_CHUNK_SIZE blocks from one reused buffer"""
+    buf = bytearray(READ_CHUNK_SIZE)
+    mv = memoryview(buf)
+    while n := f.readinto(buf):
+        yield mv[:n]
+
+
+def _read_blocks_threaded(f) -> Iterator[memoryview]:
+    """
+    Like _read_blocks, but a background thread reads the next block into a
+    second buffer while the caller is still hashing the current one
+    """
+    free_q = queue.Queue()
+    full_q = queue.Queue()
+    for _ in range(2):
+        free_q.put(bytearray(READ_CHUNK_SIZE))
+    
+    def reader():
+        try:
+            while (buf := free_q.get()) is not None:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                full_q.put((buf, n))
+            full_q.put(None)
+        except Exception as e:
+            full_q.put(e)
+    
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    try:
+        while (item := full_q.get()) is not None:
+            if isinstance(item, Exception):
+                raise item
+            buf, n = item
+            yield memoryview(buf)[:n]
+            free_q.put(buf)
+    finally:
+        # Unblock the reader if we stopped early, and never let it outlive f
+        free_q.put(None)
+        thread.join()
+
+
+def _mmap_blocks(mm: mmap.mmap) -> Iterator[memoryview]:
+    """
+    Yield MMAP_SLICE_SIZE views of a mapped file, closing the mapping when
+    done. Callers must release each view (``with chunk:``) before the next.
+    """
+    try:
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        with memoryview(mm) as mv:
+            for offset in range(0, len(mm), MMAP_SLICE_SIZE):
+                yield mv[offset:offset + MMAP_SLICE_SIZE]
+    finally:
+        mm.close()
+
+
+def _same_mtime(stored, mtime: float) -> bool:
+    """
+    Compare a stored modification time with a stat() one. Rows written
+    before mtimes were stored as epoch floats never match, so they get
+    rehashed once.
+    """
+    return isinstance(stored, (int, float)) and math.isclose(stored, mtime, rel_tol=0, abs_tol=1e-3)
+
+
+def _walk_rom_entries(root: Path, suffixes: Tuple[str, ...]) -> Iterator[os.DirEntry]:
+    """
+    Walk a directory tree once, yielding the DirEntry of each file whose
+    lowercased name ends with one of the given lowercase suffixes. Like
+    rglob, the walk doesn't descend into symlinked directories below root,
+    so links back up the tree can't repeat files.
+    """
+    stack = [str(root)]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file() and entry.name.lower().endswith(suffixes):
+                        yield entry
+        except OSError as e:
+            logger.error(f"Error listing directory {current}: {e}")
+
+
+def _stat_entry(entry: os.DirEntry) -> Optional[os.stat_result]:
+    """DirEntry.stat(), logging and returning None on failure"""
+    try:
+        return entry.stat()
+    except OSError as e:
+        logger.error(f"Error scanning file {entry.path}: {e}")
+        return None
+
+
+def _iter_rom_files(root: Path, suffixes: Tuple[str, ...], stat_workers: int = 0) -> Iterator[Tuple[Path, os.stat_result]]:
+    """
+    Yield (path, stat) for each ROM file under root. The stat comes from the
+    DirEntry, so callers need no further stat() calls. With stat_workers > 1
+    the stat() calls run on a thread pool, which hides per-call latency on
+    network shares.
+    """
+    if stat_workers > 1:
+        entries = list(_walk_rom_entries(root, suffixes))
+        with ThreadPoolExecutor(max_workers=stat_workers) as executor:
+            pairs = zip(entries, list(executor.map(_stat_entry, entries)))
+    else:
+        pairs = ((entry, _stat_entry(entry)) for entry in _walk_rom_entries(root, suffixes))
+    
+    for entry, stat in pairs:
+        if stat is not None:
+            yield Path(entry.path), stat
+
+
+def _hash_one_file(path_str: str, algorithms=DEFAULT_ALGORITHMS) -> Optional[Dict[str, str]]:
+    """
+    Calculate the requested hashes for a file
+
+    Module-level so it can be shipped to ProcessPoolExecutor workers.
+
+    Args:
+        path_str: File to hash
+        algorithms: Any of 'sha1', 'md5' and 'crc'
+
+    Returns:
+        Dictionary with 'sha1', 'md5' and 'crc' keys; hashes that were not
+        requested are None
+    """
+    want_sha1 = 'sha1' in algorithms
+    want_md5 = 'md5' in algorithms
+    want_crc = 'crc' in algorithms
+    sha1 = md5 = None
+    crc = 0
+    
+    try:
+        # Unbuffered, since we read straight into our own buffer
+        with open(path_str, 'rb', buffering=0) as f:
+            _advise_sequential(f.fileno())
+            file_size = os.fstat(f.fileno()).st_size
+            if (HAS_FILE_DIGEST and want_sha1 + want_md5 == 1 and not want_crc
+                    and file_size < THREADED_READ_MIN_SIZE):
+                # A single digest of a small file: let hashlib run the
+                # read/update loop
+                digest = hashlib.file_digest(f, 'sha1' if want_sha1 else 'md5')
+                if want_sha1:
+                    sha1 = digest
+                else:
+                    md5 = digest
+            else:
+                sha1 = hashlib.sha1() if want_sha1 else None
+                md5 = hashlib.md5() if want_md5 else None
+                blocks = None
+                if file_size >= MMAP_MIN_SIZE:
+                    try:
+                        blocks = _mmap_blocks(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                    except (OSError, ValueError) as e:
+                        logger.debug(f"Cannot mmap {path_str}, reading instead: {e}")
+                if blocks is None:
+                    if file_size >= THREADED_READ_MIN_SIZE:
+                        blocks = _read_blocks_threaded(f)
+                    else:
+                        blocks = _read_blocks(f)
+                # Bind the update methods once rather than per block
+                sha1_update = sha1.update if sha1 else None
+                md5_update = md5.update if md5 else None
+                crc32 = zlib.crc32
+                # One pass feeding every hash; OpenSSL and zlib release the
+                # GIL on buffers this size
+                for chunk in blocks:
+                    with chunk:
+                        if sha1_update:
+                            sha1_update(chunk)
+                        if md5_update:
+                            md5_update(chunk)
+                        if want_crc:
+                            # CRC32 for compatibility with ROMM; one call per
+                            # block keeps zlib on its fast path
+                            crc = crc32(chunk, crc)
+            _advise_done(f.fileno())
+        
+        return {
+            'sha1': sha1.hexdigest() if sha1 else None,
+            'md5': md5.hexdigest() if md5 else None,
+            'crc': format(crc & 0xFFFFFFFF, '08x') if want_crc else None
+        }
+    except Exception as e:
+        logger.error(f"Error hashing file {path_str}: {e}")
+        return None
+
 
 class RomScanner:
     # Common ROM file extensions by platform
@@ -23,125 +300,303 @@ class RomScanner:
         'n64': ['.n64', '.z64', '.v64'],
         'gc': ['.iso', '.gcm', '.rvz'],
         'wii': ['.iso', '.wbfs', '.rvz'],
+        'wiiu': ['.wud', '.wux', '.wua', '.rpx'],
+        'nds': ['.nds'],
+        '3ds': ['.3ds', '.cia', '.cci', '.cxi', '.3dsx'],
+        'switch': ['.nsp', '.xci', '.nsz', '.xcz'],
         'psx': ['.bin', '.cue', '.chd', '.pbp', '.iso'],
         'ps2': ['.iso', '.bin', '.chd'],
+        'ps3': ['.iso', '.pkg'],
         'psp': ['.iso', '.cso'],
+        'psvita': ['.vpk', '.pkg'],
         'megadrive': ['.md', '.smd', '.gen', '.bin'],
         'mastersystem': ['.sms'],
         'gamegear': ['.gg'],
+        'saturn': ['.cue', '.chd', '.iso', '.bin', '.ccd', '.mds'],
         'dreamcast': ['.cdi', '.gdi', '.chd'],
         'atari2600': ['.a26', '.bin'],
+        'atari5200': ['.a52', '.bin'],
         'atari7800': ['.a78'],
         'atarilynx': ['.lnx'],
         'pcengine': ['.pce', '.cue', '.chd'],
         'ngp': ['.ngp'],
         'ngpc': ['.ngc'],
     }
+    # RetroDeck (and generate_mappings) also name the Mega Drive folder 'genesis'
+    ROM_EXTENSIONS['genesis'] = ROM_EXTENSIONS['megadrive']
     
-    def __init__(self, retrodeck_path: str):
+    # Lowercased extension lookups, built once at import
+    _EXT_SETS = {k: frozenset(e.lower() for e in v) for k, v in ROM_EXTENSIONS.items()}
+    # str.endswith accepts a tuple of suffixes
+    _EXT_TUPLES = {k: tuple(exts) for k, exts in _EXT_SETS.items()}
+    
+    def __init__(self, retrodeck_path: str, hash_workers: Optional[int] = None, stat_workers: int = 0):
         self.retrodeck_path = Path(retrodeck_path).expanduser()
+        # ROMs usually share one disk, so more workers mostly adds seeking
+        self.hash_workers = hash_workers or min(os.cpu_count() or 1, 4)
+        # Only worth it on network storage; local disks answer stat() from cache
+        self.stat_workers = stat_workers or 0
+        # Hashing process pool, started on first use and kept until close(),
+        # so each worker pays the spawn start-up cost only once
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        _check_zlib_version()
         if not self.retrodeck_path.exists():
             logger.warning(f"RetroDeck path does not exist: {self.retrodeck_path}")
     
-    def _calculate_file_hashes(self, file_path: Path) -> Dict[str, str]:
-        """Calculate SHA1, MD5, and CRC32 hashes for a file"""
-        sha1 = hashlib.sha1()
-        md5 = hashlib.md5()
-        crc = 0
+    def _calculate_file_hashes(self, file_path: Path, algorithms=DEFAULT_ALGORITHMS) -> Dict[str, str]:
+        """Calculate the requested hashes for a file (see _hash_one_file)"""
+        return _hash_one_file(str(file_path), algorithms)
+    
+    def supports_platform(self, platform: str) -> bool:
+        """Whether ROM files can be recognised in this platform's folder"""
+        return platform.lower() in self._EXT_TUPLES
+    
+    def get_sha1(self, file_path: str) -> Optional[str]:
+        """Calculate just the SHA1 of a file, e.g. to confirm a CRC match"""
+        hashes = self._calculate_file_hashes(Path(file_path), DEFAULT_ALGORITHMS)
+        return hashes['sha1'] if hashes else None
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Return the hashing process pool, starting it if needed"""
+        with self._pool_lock:
+            if self._pool is None:
+                # Spawn workers: the app process has other threads running, and
+                # forking while one of them holds a lock can deadlock the child
+                self._pool = ProcessPoolExecutor(max_workers=self.hash_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+    
+    def close(self):
+        """Stop the hashing process pool, dropping queued files"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+    
+    def _hash_files(self, files: List[Tuple], algorithms=DEFAULT_ALGORITHMS,
+                    stop_event: Optional[threading.Event] = None) -> Iterator[Tuple[Tuple, Optional[Dict[str, str]]]]:
+        """
+        Hash files across the process pool, yielding (item, hashes) as each
+        file completes. Each item is a tuple whose first element is the path;
+        a few files are hashed in-process. Stops early once stop_event is set.
+        """
+        if self.hash_workers <= 1 or len(files) < PROCESS_POOL_MIN_FILES:
+            for item in files:
+                if stop_event is not None and stop_event.is_set():
+                    return
+                yield item, self._calculate_file_hashes(item[0], algorithms)
+            return
         
+        executor = self._get_pool()
+        futures = {executor.submit(_hash_one_file, str(item[0]), algorithms): item for item in files}
         try:
-            with open(file_path, 'rb') as f:
-                while chunk := f.read(8192):
-                    sha1.update(chunk)
-                    md5.update(chunk)
-                    # Simple CRC32 (for compatibility with ROMM's CRC)
-                    import zlib
-                    crc = zlib.crc32(chunk, crc)
-            
-            return {
-                'sha1': sha1.hexdigest(),
-                'md5': md5.hexdigest(),
-                'crc': format(crc & 0xFFFFFFFF, '08x')
-            }
-        except Exception as e:
-            logger.error(f"Error hashing file {file_path}: {e}")
-            return None
+            for future in as_completed(futures):
+                if stop_event is not None and stop_event.is_set():
+                    # Drop the queued files and wait only for those in progress
+                    self.close()
+                    return
+                yield futures[future], future.result()
+        except BrokenProcessPool:
+            # A worker died; start a new pool next time
+            with self._pool_lock:
+                if self._pool is executor:
+                    self._pool = None
+            raise
+        finally:
+            # Drop files not yet started if the caller stopped early
+            for future in futures:
+                future.cancel()
     
-    def scan_platform(self, platform: str, progress_callback: Optional[Callable] = None) -> List[Dict]:
+    def scan_platform(self, platform: str, progress_callback: Optional[Callable] = None,
+                      scan_mode: str = 'full') -> List[Dict]:
         """
         Scan a specific platform directory for ROM files
         
         Args:
             platform: Platform folder name (e.g., 'snes', 'gb')
             progress_callback: Optional callback function(current, total, filename)
+            scan_mode: 'full' (SHA1) or 'quick' (CRC32 only)
         
         Returns:
             List of ROM file information dictionaries
         """
-        platform_path = self.retrodeck_path / platform
+        results, _ = self.scan_platform_changes(platform, {}, progress_callback, scan_mode)
+        return results
+    
+    def scan_platform_changes(self, platform: str, fingerprints: Dict[str, Tuple],
+                              progress_callback: Optional[Callable] = None,
+                              scan_mode: str = 'full') -> Tuple[List[Dict], List[str]]:
+        """
+        Scan a platform directory, hashing only files that are new or changed
         
-        if not platform_path.exists():
-            logger.warning(f"Platform directory does not exist: {platform_path}")
-            return []
-        
-        # Get valid extensions for this platform
-        valid_extensions = self.ROM_EXTENSIONS.get(platform.lower(), [])
-        if not valid_extensions:
-            logger.warning(f"No known extensions for platform: {platform}")
-            # Scan all files if we don't know the platform
-            valid_extensions = ['.*']
-        
-        # Find all ROM files
-        rom_files = []
-        for ext in valid_extensions:
-            if ext == '.*':
-                # Scan all files
-                rom_files.extend(platform_path.rglob('*'))
-            else:
-                rom_files.extend(platform_path.rglob(f'*{ext}'))
+        Args:
+            platform: Platform folder name (e.g., 'snes', 'gb')
+            fingerprints: Mapping of file path to (file_size, last_modified epoch)
+                from the previous scan (see Database.get_fingerprints)
+            progress_callback: Optional callback function(current, total, filename)
+            scan_mode: 'full' (SHA1) or 'quick' (CRC32 only)
         
-        # Filter out directories
-        rom_files = [f for f in rom_files if f.is_file()]
+        Returns:
+            Tuple of (ROM info for new or changed files, paths from
+            fingerprints that are no longer on disk)
+        """
+        changes = self.scan_platforms_changes({platform: fingerprints}, progress_callback, scan_mode)
+        return changes.get(platform, ([], [], 0.0))[:2]
+    
+    def scan_platforms_changes(self, fingerprints: Dict[str, Dict[str, Tuple]],
+                               progress_callback: Optional[Callable] = None,
+                               scan_mode: str = 'full',
+                               platform_callback: Optional[Callable] = None,
+                               platform_progress_callback: Optional[Callable] = None,
+                               stop_event: Optional[threading.Event] = None) -> Dict[str, Tuple[List[Dict], List[str], float]]:
+        """
+        Scan several platform directories in one pass, hashing new or changed
+        files from all of them on a single worker pool
         
-        logger.info(f"Found {len(rom_files)} potential ROM files in {platform_path}")
+        Args:
+            fingerprints: Mapping of platform folder name to that platform's
+                {file_path: (file_size, last_modified epoch)}
+            progress_callback: Optional callback function(current, total, filename)
+            scan_mode: 'full' (SHA1) or 'quick' (CRC32 only)
+            platform_callback: Optional callback function(platform, current, total)
+                called as each platform directory is listed
+            platform_progress_callback: Optional callback function(platform,
+                current, total) with the files done so far within each platform
+            stop_event: Optional event that abandons the scan once set
         
-        results = []
-        total = len(rom_files)
+        Returns:
+            Dictionary mapping platform names to (ROM info for new or changed
+            files, fingerprinted paths no longer on disk, seconds spent on the
+            platform); platforms with no known extensions are left out. The
+            seconds are the time walking its folder plus the time until its
+            last file was hashed, which overlaps with other platforms. Empty
+            if the scan was stopped, since partial results would mark
+            unhashed files as removed.
+        """
+        algorithms = SCAN_MODE_ALGORITHMS[scan_mode]
+        rom_files, durations = self._find_rom_files(list(fingerprints), platform_callback, stop_event)
         
-        for idx, rom_file in enumerate(rom_files, 1):
-            if progress_callback:
-                progress_callback(idx, total, rom_file.name)
-            
-            try:
-                # Get file info
-                stat = rom_file.stat()
+        results = {platform: [] for platform in fingerprints}
+        missing = {platform: set(fps) for platform, fps in fingerprints.items()}
+        unchanged = dict.fromkeys(fingerprints, 0)
+        platform_totals = {platform: len(files) for platform, files in rom_files.items() if files}
+        platform_done = dict.fromkeys(platform_totals, 0)
+        total = sum(platform_totals.values())
+        done = 0
+        to_hash = []
+        
+        for platform, files in rom_files.items():
+            if files is None:
+                # No directory: everything we knew about is gone
+                continue
+            platform_fingerprints = fingerprints[platform]
+            for rom_file, stat in files:
                 file_size = stat.st_size
-                last_modified = datetime.fromtimestamp(stat.st_mtime)
+                last_modified = stat.st_mtime
                 
-                # Calculate hashes
-                hashes = self._calculate_file_hashes(rom_file)
-                if not hashes:
-                    continue
-                
-                results.append({
-                    'platform': platform,
-                    'file_name': rom_file.name,
-                    'file_path': str(rom_file),
-                    'file_size': file_size,
-                    'sha1_hash': hashes['sha1'],
-                    'md5_hash': hashes['md5'],
-                    'crc_hash': hashes['crc'],
-                    'last_modified': last_modified
-                })
-                
-                logger.debug(f"Scanned: {rom_file.name} (SHA1: {hashes['sha1'][:8]}...)")
-                
-            except Exception as e:
-                logger.error(f"Error scanning file {rom_file}: {e}")
+                # Skip files that are unchanged since the last scan
+                path_str = str(rom_file)
+                missing[platform].discard(path_str)
+                known = platform_fingerprints.get(path_str)
+                if known and known[0] == file_size and _same_mtime(known[1], last_modified):
+                    unchanged[platform] += 1
+                    done += 1
+                    platform_done[platform] += 1
+                    if progress_callback:
+                        progress_callback(done, total, rom_file.name)
+                else:
+                    to_hash.append((rom_file, platform, file_size, last_modified))
+        
+        if platform_progress_callback:
+            for platform, platform_total in platform_totals.items():
+                platform_progress_callback(platform, platform_done[platform], platform_total)
+        
+        # Hash the remaining files, reporting progress as each one finishes
+        hash_start = time.monotonic()
+        hashed_until = {}
+        for (rom_file, platform, file_size, last_modified), hashes in self._hash_files(to_hash, algorithms, stop_event):
+            hashed_until[platform] = time.monotonic() - hash_start
+            done += 1
+            platform_done[platform] += 1
+            if progress_callback:
+                progress_callback(done, total, rom_file.name)
+            if platform_progress_callback:
+                platform_progress_callback(platform, platform_done[platform], platform_totals[platform])
+            
+            if not hashes:
                 continue
+            
+            results[platform].append({
+                'platform': platform,
+                'file_name': rom_file.name,
+                'file_path': str(rom_file),
+                'file_size': file_size,
+                'sha1_hash': hashes['sha1'],
+                'md5_hash': hashes['md5'],
+                'crc_hash': hashes['crc'],
+                'last_modified': last_modified
+            })
+            logger.debug(f"Scanned: {rom_file.name} (SHA1: {hashes['sha1']}, CRC: {hashes['crc']})")
         
-        logger.info(f"Successfully scanned {len(results)} ROM files for platform {platform}")
-        return results
+        if stop_event is not None and stop_event.is_set():
+            logger.info("Scan stopped before it finished")
+            return {}
+        
+        changes = {}
+        for platform in fingerprints:
+            if platform not in rom_files:
+                # Unknown platform, nothing was scanned
+                continue
+            logger.info(f"Successfully scanned {len(results[platform])} ROM files for platform {platform} "
+                        f"({unchanged[platform]} unchanged, {len(missing[platform])} removed)")
+            duration = durations.get(platform, 0.0) + hashed_until.get(platform, 0.0)
+            changes[platform] = (results[platform], list(missing[platform]), duration)
+        return changes
+    
+    def _find_rom_files(self, platforms: List[str],
+                        platform_callback: Optional[Callable] = None,
+                        stop_event: Optional[threading.Event] = None) -> Tuple[Dict[str, Optional[List[Tuple[Path, os.stat_result]]]], Dict[str, float]]:
+        """
+        List the RetroDeck folder once and walk each requested platform's
+        folder for ROM files. Platforms without a folder map to None; those
+        with no known extensions are left out. Also returns the seconds
+        spent walking each platform's folder. Platforms not reached before
+        stop_event is set are left out too.
+        """
+        try:
+            with os.scandir(self.retrodeck_path) as entries:
+                folders = {entry.name: Path(entry.path) for entry in entries if entry.is_dir()}
+        except OSError as e:
+            logger.error(f"Error listing {self.retrodeck_path}: {e}")
+            folders = {}
+        
+        found = {}
+        durations = {}
+        for idx, platform in enumerate(platforms, 1):
+            if stop_event is not None and stop_event.is_set():
+                break
+            if platform_callback:
+                platform_callback(platform, idx, len(platforms))
+            
+            platform_path = folders.get(platform)
+            if platform_path is None:
+                logger.warning(f"Platform directory does not exist: {self.retrodeck_path / platform}")
+                found[platform] = None
+                continue
+            
+            # Get valid extensions for this platform
+            suffixes = self._EXT_TUPLES.get(platform.lower())
+            if not suffixes:
+                logger.warning(f"No known extensions for platform: {platform}, skipping")
+                continue
+            
+            walk_start = time.monotonic()
+            found[platform] = list(_iter_rom_files(platform_path, suffixes, self.stat_workers))
+            durations[platform] = time.monotonic() - walk_start
+            logger.info(f"Found {len(found[platform])} potential ROM files in {platform_path}")
+        
+        return found, durations
     
     def scan_all_platforms(self, platforms: List[str], progress_callback: Optional[Callable] = None) -> Dict[str, List[Dict]]:
         """
@@ -154,19 +609,9 @@ class RomScanner:
         Returns:
             Dictionary mapping platform names to lists of ROM info
         """
-        results = {}
-        total_platforms = len(platforms)
-        
-        for idx, platform in enumerate(platforms, 1):
-            logger.info(f"Scanning platform {idx}/{total_platforms}: {platform}")
-            
-            if progress_callback:
-                progress_callback(platform, idx, total_platforms)
-            
-            platform_results = self.scan_platform(platform)
-            results[platform] = platform_results
-        
-        return results
+        changes = self.scan_platforms_changes({platform: {} for platform in platforms},
+                                              platform_callback=progress_callback)
+        return {platform: results for platform, (results, _, _) in changes.items()}
     
     def quick_scan_file(self, file_path: Path) -> Optional[Dict]:
         """Quickly scan a single file and return its hash info"""
@@ -185,7 +630,7 @@ class RomScanner:
                     'sha1_hash': hashes['sha1'],
                     'md5_hash': hashes['md5'],
                     'crc_hash': hashes['crc'],
-                    'last_modified': datetime.fromtimestamp(stat.st_mtime)
+                    'last_modified': stat.st_mtime
                 }
         except Exception as e:
             logger.error(f"Error quick scanning {file_path}: {e}")
@@ -199,17 +644,10 @@ class RomScanner:
         if not platform_path.exists():
             return {'exists': False, 'file_count': 0, 'total_size': 0}
         
-        valid_extensions = self.ROM_EXTENSIONS.get(platform.lower(), ['.*'])
-        
-        rom_files = []
-        for ext in valid_extensions:
-            if ext == '.*':
-                rom_files.extend(platform_path.rglob('*'))
-            else:
-                rom_files.extend(platform_path.rglob(f'*{ext}'))
+        suffixes = self._EXT_TUPLES.get(platform.lower(), ())
         
-        rom_files = [f for f in rom_files if f.is_file()]
-        total_size = sum(f.stat().st_size for f in rom_files)
+        rom_files = list(_iter_rom_files(platform_path, suffixes, self.stat_workers)) if suffixes else []
+        total_size = sum(stat.st_size for _, stat in rom_files)
         
         return {
             'exists': True,
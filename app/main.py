@@ -2,17 +2,26 @@
 RommSync - Main Application
 A tool to sync ROMs from ROMM server to RetroDeck
 """
+import re
 import sys
+import copy
+import hashlib
+import asyncio
+import threading
+import multiprocessing
 import yaml
+import orjson
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List, Dict
+from types import MappingProxyType
+from typing import Optional, List, Dict, Iterable, Iterator, Literal, Tuple
 import webbrowser
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
@@ -32,7 +41,49 @@ config = None
 db = None
 romm_client = None
 scanner = None
-scan_in_progress = False
+
+# Read-only view of config['platform_mapping'] (ROMM platform name ->
+# RetroDeck folder), rebuilt whenever the config is loaded or saved
+platform_mapping = MappingProxyType({})
+
+# Platforms with a scan running, and their progress as
+# {platform: {'scanned': files done, 'total': files found}}
+scanning_platforms = set()
+scan_progress = {}
+scan_lock = asyncio.Lock()
+
+# Seconds between progress events on /api/scan/events
+SCAN_EVENT_INTERVAL = 0.5
+
+# Downloads allowed to run at once; scans run one after another
+DOWNLOAD_WORKERS = 4
+
+# libyaml's C loader and dumper are several times faster than the
+# pure-Python ones
+try:
+    from yaml import CSafeLoader as YamlLoader, CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeLoader as YamlLoader, SafeDumper as YamlDumper
+
+# Parsed config file, reused until the file changes: (path, mtime_ns, config)
+_config_cache = None
+
+# RetroDeck folders for ROMM platform names (same as generate_platform_mapping.py)
+KNOWN_MAPPINGS = MappingProxyType({
+    "Nintendo - Game Boy": "gb", "Nintendo - Game Boy Color": "gbc",
+    "Nintendo - Game Boy Advance": "gba", "Nintendo - Nintendo Entertainment System": "nes",
+    "Nintendo - Super Nintendo Entertainment System": "snes", "Nintendo - Nintendo 64": "n64",
+    "Nintendo - GameCube": "gc", "Nintendo - Wii": "wii", "Nintendo - Wii U": "wiiu",
+    "Nintendo - Nintendo DS": "nds", "Nintendo - Nintendo 3DS": "3ds", "Nintendo Switch": "switch",
+    "Sony - PlayStation": "psx", "Sony - PlayStation 2": "ps2", "Sony - PlayStation 3": "ps3",
+    "Sony - PlayStation Portable": "psp", "Sony - PlayStation Vita": "psvita",
+    "Sega - Master System": "mastersystem", "Sega - Mega Drive": "genesis",
+    "Sega - Game Gear": "gamegear", "Sega - Saturn": "saturn", "Sega - Dreamcast": "dreamcast",
+    "Atari 2600": "atari2600", "Atari 5200": "atari5200", "Atari 7800": "atari7800"
+})
+
+# Characters dropped when deriving a folder name from a platform name
+_SLUG_RE = re.compile(r'[\s\-]+')
 
 
 def load_config():
@@ -59,9 +110,7 @@ def load_config():
             if not config_path.exists():
                 raise FileNotFoundError("No config.yaml found. Copy config.example.yaml to config.yaml")
     
-    logger.info(f"Loading config from: {config_path}")
-    with open(config_path, 'r') as f:
-        cfg = yaml.safe_load(f)
+    cfg = _read_config_file(config_path)
     
     # Set database path
     if getattr(sys, 'frozen', False):
@@ -75,6 +124,28 @@ def load_config():
     return cfg
 
 
+def _read_config_file(config_path: Path) -> Dict:
+    """Parse a config file, reusing the last parse if the file is unchanged"""
+    global _config_cache
+    
+    mtime_ns = config_path.stat().st_mtime_ns
+    if _config_cache and _config_cache[:2] == (config_path, mtime_ns):
+        logger.info(f"Using cached config from: {config_path}")
+    else:
+        logger.info(f"Loading config from: {config_path}")
+        with open(config_path, 'r') as f:
+            _config_cache = (config_path, mtime_ns, yaml.load(f, Loader=YamlLoader))
+    
+    # Callers modify their config, so never hand out the cached one
+    return copy.deepcopy(_config_cache[2])
+
+
+def refresh_platform_mapping():
+    """Rebuild the platform_mapping view from the current config"""
+    global platform_mapping
+    platform_mapping = MappingProxyType(dict(config.get('platform_mapping') or {}))
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
@@ -83,13 +154,14 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting RommSync...")
     config = load_config()
+    refresh_platform_mapping()
     
     # Initialize database
     db = Database(config['paths']['database'])
     
     # Initialize ROMM client
     try:
-        romm_client = RommClient(
+        romm_client = await RommClient.connect(
             config['romm']['url'],
             config['romm']['username'],
             config['romm']['password']
@@ -99,7 +171,22 @@ async def lifespan(app: FastAPI):
         logger.error("Please check your config.yaml settings")
     
     # Initialize scanner
-    scanner = RomScanner(config['paths']['retrodeck_roms'])
+    scanner = RomScanner(
+        config['paths']['retrodeck_roms'],
+        hash_workers=config.get('performance', {}).get('hash_workers'),
+        stat_workers=config.get('performance', {}).get('stat_workers', 0)
+    )
+    
+    # Bounded pools for background work, so downloads and scans can't
+    # exhaust the threadpool that serves requests
+    app.state.download_pool = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix='dl')
+    app.state.download_slots = asyncio.Semaphore(DOWNLOAD_WORKERS)
+    app.state.scan_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scan')
+    # Running download tasks, and whether new work is still accepted
+    app.state.downloads = set()
+    app.state.shutting_down = False
+    # Set at shutdown to abandon a running scan
+    app.state.scan_stop = threading.Event()
     
     logger.info("RommSync started successfully!")
     
@@ -107,6 +194,21 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down RommSync...")
+    app.state.shutting_down = True
+    # Stop in-flight downloads before their pool and the database go away
+    downloads = list(app.state.downloads)
+    for task in downloads:
+        task.cancel()
+    await asyncio.gather(*downloads, return_exceptions=True)
+    # Stop a running scan without saving it and drop queued ones, then wait
+    # (off the event loop) for the files being hashed
+    app.state.scan_stop.set()
+    await asyncio.to_thread(app.state.scan_pool.shutdown, wait=True, cancel_futures=True)
+    await asyncio.to_thread(app.state.download_pool.shutdown, wait=True, cancel_futures=True)
+    if scanner:
+        await asyncio.to_thread(scanner.close)
+    if romm_client:
+        await romm_client.close()
     if db:
         db.close()
 
@@ -116,7 +218,8 @@ app = FastAPI(
     title="RommSync",
     description="Sync ROMs from ROMM to RetroDeck",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Mount static files
@@ -139,6 +242,8 @@ app.mount("/static", StaticFiles(directory=str(static_path)), name="static")
 # Pydantic models
 class ScanRequest(BaseModel):
     platforms: List[str]
+    # 'quick' only computes CRC32; SHA1 is filled in when a CRC matches ROMM
+    scan_mode: Literal['full', 'quick'] = 'full'
 
 
 class DownloadRequest(BaseModel):
@@ -146,6 +251,135 @@ class DownloadRequest(BaseModel):
     platform: str
 
 
+async def _db(fn, *args, **kwargs):
+    """Run a blocking database (or disk) call in a worker thread"""
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+def index_local_roms(platform: str) -> Tuple[Dict, Dict]:
+    """Local ROMs of a platform keyed by file name, and grouped by CRC32"""
+    by_filename = {}
+    by_crc = {}
+    for local in db.iter_local_roms_by_platform(platform):
+        by_filename[local['file_name']] = local
+        if local['crc_hash']:
+            by_crc.setdefault(local['crc_hash'], []).append(local)
+    return by_filename, by_crc
+
+
+def match_local_rom_by_crc(file_info: Dict, candidates: List[Dict], confirm: bool = True) -> Optional[Dict]:
+    """
+    Pick the local ROM matching a ROMM file from candidates with the same
+    CRC32 and size. If ROMM has a SHA1, candidates from a quick scan are
+    hashed now to confirm, and their SHA1 is stored so later lookups hit the
+    hash index; with confirm=False (listings) they are accepted unhashed.
+    """
+    sha1 = file_info.get('sha1_hash')
+    size = file_info.get('file_size_bytes')
+    for local in candidates:
+        if size is not None and local['file_size'] != size:
+            continue
+        if not sha1:
+            return local
+        if not local['sha1_hash']:
+            if not confirm:
+                return local
+            local_sha1 = scanner.get_sha1(local['file_path'])
+            if not local_sha1:
+                continue
+            db.set_sha1_hash(local['file_path'], local_sha1)
+            local['sha1_hash'] = local_sha1
+        if local['sha1_hash'] == sha1:
+            return local
+    return None
+
+
+def enhance_roms(platform_id: int, roms: List, local_roms_by_hash: Dict,
+                 local_roms_by_crc: Dict, local_roms_by_filename: Dict) -> Iterator[Dict]:
+    """Yield the ROMM ROMs with their local availability status"""
+    count = 0
+    for idx, rom in enumerate(roms):
+        try:
+            # Check if rom is a dict
+            if not isinstance(rom, dict):
+                logger.error(f"ROM {idx} is not a dict, it's {type(rom)}")
+                continue
+            
+            # Extract just the data we need
+            rom_data = {
+                'id': rom.get('id'),
+                'name': rom.get('name'),
+                'file_name': rom.get('file_name'),
+                'files': rom.get('files', []),
+                'summary': rom.get('summary'),
+                'url_cover': rom.get('url_cover'),
+            }
+            
+            local_rom = None
+            
+            if 'files' in rom and len(rom['files']) > 0:
+                file_info = rom['files'][0]
+                sha1 = file_info.get('sha1_hash')
+                crc = (file_info.get('crc_hash') or '').lower()
+                file_name = file_info.get('file_name')
+                
+                # Try hash match first
+                if sha1:
+                    local_rom = local_roms_by_hash.get(sha1)
+                
+                # Then CRC, for quick-scanned files
+                if not local_rom and crc in local_roms_by_crc:
+                    # CRC32 plus size is enough for a listing; hashing every
+                    # quick-scanned file here would defeat quick mode
+                    local_rom = match_local_rom_by_crc(file_info, local_roms_by_crc[crc], confirm=False)
+                
+                # Fallback to filename match
+                if not local_rom and file_name and file_name in local_roms_by_filename:
+                    local_rom = local_roms_by_filename[file_name]
+                
+                rom_data['local_available'] = local_rom is not None
+                if local_rom:
+                    rom_data['local_path'] = local_rom['file_path']
+            else:
+                rom_data['local_available'] = False
+            
+            count += 1
+            yield rom_data
+        except Exception as rom_error:
+            logger.error(f"Error processing ROM index {idx}: {rom_error}", exc_info=True)
+            continue
+    
+    logger.info(f"Returned {count} ROMs for platform {platform_id}")
+
+
+def make_etag(data: bytes) -> str:
+    """Strong ETag for a response body, or for the inputs it is built from"""
+    return '"' + hashlib.sha1(data).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the client's If-None-Match already names this ETag"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return etag in tags or '*' in tags
+
+
+# Clients may reuse a response only after checking its ETag
+ETAG_CACHE_CONTROL = 'private, no-cache'
+
+
+def stream_json_array(items: Iterable) -> Iterator[bytes]:
+    """Encode items as a JSON array one element at a time"""
+    yield b'['
+    separator = b''
+    for item in items:
+        yield separator + orjson.dumps(item)
+        separator = b','
+    yield b']'
+
+
 # API Endpoints
 
 @app.get("/")
@@ -165,7 +399,7 @@ async def get_config():
     }
 
 @app.post("/api/config")
-async def save_config(request: Request):
+async def save_config(request: Request, background_tasks: BackgroundTasks):
     """Save configuration to config.yaml"""
     try:
         data = await request.json()
@@ -179,6 +413,7 @@ async def save_config(request: Request):
         
         config['paths']['retrodeck_roms'] = data.get('retrodeck_path', config['paths']['retrodeck_roms'])
         config['platform_mapping'] = data.get('platform_mapping', config.get('platform_mapping', {}))
+        refresh_platform_mapping()
         
         # Determine config file location
         if getattr(sys, 'frozen', False):
@@ -188,17 +423,26 @@ async def save_config(request: Request):
         
         # Save to file
         with open(config_path, 'w') as f:
-            yaml.dump(config, f, default_flow_style=False)
+            yaml.dump(config, f, Dumper=YamlDumper, default_flow_style=False)
         
         logger.info(f"Configuration saved to {config_path}")
         
-        # Reinitialize ROMM client with new credentials
+        # Point the ROMM client at the new details, keeping its connections,
+        # and check them after responding
         global romm_client
-        romm_client = RommClient(
-            config['romm']['url'],
-            config['romm']['username'],
-            config['romm']['password']
-        )
+        if romm_client:
+            romm_client.update_credentials(
+                config['romm']['url'],
+                config['romm']['username'],
+                config['romm']['password']
+            )
+        else:
+            romm_client = RommClient(
+                config['romm']['url'],
+                config['romm']['username'],
+                config['romm']['password']
+            )
+        background_tasks.add_task(romm_client.check_connection)
         
         return {"status": "success", "message": "Configuration saved"}
     except Exception as e:
@@ -207,23 +451,24 @@ async def save_config(request: Request):
 
 
 @app.get("/api/platforms")
-async def get_platforms():
+async def get_platforms(request: Request):
     """Get all platforms from ROMM"""
     if not romm_client:
         raise HTTPException(status_code=503, detail="ROMM client not initialized")
     
     try:
-        platforms = romm_client.get_platforms()
+        # Copy the client's cached platforms before annotating them
+        platforms = [dict(platform) for platform in await romm_client.get_platforms()]
         
         # Get local ROM counts from database
-        local_stats = db.get_scan_stats()
+        local_stats = await _db(db.get_scan_stats)
         local_by_platform = {p['platform']: p['count'] for p in local_stats.get('by_platform', [])}
         
         # Enhance with local stats
         for platform in platforms:
             platform_name = platform.get('name', '')
             # Try to find matching RetroDeck folder
-            retrodeck_folder = config.get('platform_mapping', {}).get(platform_name)
+            retrodeck_folder = platform_mapping.get(platform_name)
             
             if retrodeck_folder:
                 # Get count from database
@@ -235,80 +480,60 @@ async def get_platforms():
             else:
                 platform['local_stats'] = {'exists': False, 'file_count': 0}
         
-        return platforms
+        body = orjson.dumps(platforms)
+        etag = make_etag(body)
+        headers = {'ETag': etag, 'Cache-Control': ETAG_CACHE_CONTROL}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
     except Exception as e:
         logger.error(f"Error getting platforms: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/platforms/{platform_id}/roms")
-async def get_platform_roms(platform_id: int):
+async def get_platform_roms(platform_id: int, request: Request):
     """Get all ROMs for a platform with local availability status"""
     if not romm_client:
         raise HTTPException(status_code=503, detail="ROMM client not initialized")
     
     try:
         # Get ROMs from ROMM
-        roms = romm_client.get_roms_by_platform(platform_id)
+        roms = await romm_client.get_roms_by_platform(platform_id)
         
         # Get platform info to find the local folder
-        platform_info = romm_client.get_platform_by_id(platform_id)
+        platform_info = await romm_client.get_platform_by_id(platform_id)
         platform_name = platform_info.get('name') if platform_info else None
-        retrodeck_folder = config.get('platform_mapping', {}).get(platform_name) if platform_name else None
+        retrodeck_folder = platform_mapping.get(platform_name) if platform_name else None
+        
+        # Make just-downloaded ROMs visible before looking anything up
+        await _db(db.flush)
         
-        # Get all local ROMs for this platform once (for filename fallback)
+        # The listing only changes with the ROMM data, the folder mapping or
+        # the local database, so skip matching when the client is current
+        etag = make_etag(f"{romm_client.rom_list_version(platform_id)}|{retrodeck_folder}|{db.data_version}".encode())
+        headers = {'ETag': etag, 'Cache-Control': ETAG_CACHE_CONTROL}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        
+        # Get all local ROMs for this platform once (for CRC and filename fallback)
         local_roms_by_filename = {}
+        local_roms_by_crc = {}
         if retrodeck_folder:
-            local_roms = db.get_local_roms_by_platform(retrodeck_folder)
-            local_roms_by_filename = {rom['file_name']: rom for rom in local_roms}
+            local_roms_by_filename, local_roms_by_crc = await _db(index_local_roms, retrodeck_folder)
         
-        # Create new list with local availability info
-        enhanced_roms = []
-        for idx, rom in enumerate(roms):
-            try:
-                # Check if rom is a dict
-                if not isinstance(rom, dict):
-                    logger.error(f"ROM {idx} is not a dict, it's {type(rom)}")
-                    continue
-                
-                # Extract just the data we need
-                rom_data = {
-                    'id': rom.get('id'),
-                    'name': rom.get('name'),
-                    'file_name': rom.get('file_name'),
-                    'files': rom.get('files', []),
-                    'summary': rom.get('summary'),
-                    'url_cover': rom.get('url_cover'),
-                }
-                
-                local_rom = None
-                
-                if 'files' in rom and len(rom['files']) > 0:
-                    file_info = rom['files'][0]
-                    sha1 = file_info.get('sha1_hash')
-                    file_name = file_info.get('file_name')
-                    
-                    # Try hash match first
-                    if sha1:
-                        local_rom = db.get_local_rom_by_hash(sha1)
-                    
-                    # Fallback to filename match
-                    if not local_rom and file_name and file_name in local_roms_by_filename:
-                        local_rom = local_roms_by_filename[file_name]
-                    
-                    rom_data['local_available'] = local_rom is not None
-                    if local_rom:
-                        rom_data['local_path'] = local_rom['file_path']
-                else:
-                    rom_data['local_available'] = False
-                
-                enhanced_roms.append(rom_data)
-            except Exception as rom_error:
-                logger.error(f"Error processing ROM index {idx}: {rom_error}", exc_info=True)
-                continue
+        # Look up all hash matches in one go rather than once per ROM
+        sha1s = {rom['files'][0].get('sha1_hash') for rom in roms
+                 if isinstance(rom, dict) and rom.get('files')}
+        sha1s.discard(None)
+        local_roms_by_hash = await _db(db.get_local_roms_by_hashes, sha1s)
         
-        logger.info(f"Returning {len(enhanced_roms)} ROMs for platform {platform_id}")
-        return JSONResponse(content=enhanced_roms)
+        # Stream the ROMs out as they are matched rather than building the
+        # whole list first
+        enhanced_roms = enhance_roms(platform_id, roms, local_roms_by_hash,
+                                     local_roms_by_crc, local_roms_by_filename)
+        return StreamingResponse(stream_json_array(enhanced_roms), media_type="application/json",
+                                 headers=headers)
     except Exception as e:
         logger.error(f"Error getting ROMs for platform {platform_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -321,41 +546,48 @@ async def get_rom_details(rom_id: int):
         raise HTTPException(status_code=503, detail="ROMM client not initialized")
     
     try:
-        rom = romm_client.get_rom_by_id(rom_id)
+        rom = await romm_client.get_rom_by_id(rom_id)
         if not rom:
             raise HTTPException(status_code=404, detail="ROM not found")
+        # The client caches ROMs, so annotate a copy
+        rom = dict(rom)
         
         # Check local availability
         if 'files' in rom and len(rom['files']) > 0:
             file_info = rom['files'][0]
             sha1 = file_info.get('sha1_hash')
+            crc = (file_info.get('crc_hash') or '').lower()
             file_name = file_info.get('file_name')
             
-            logger.info(f"Checking ROM {rom_id} - SHA1: {sha1}, Filename: {file_name}")
+            logger.info(f"Checking ROM {rom_id} - SHA1: {sha1}, CRC: {crc}, Filename: {file_name}")
             
             local_rom = None
             
             # Try hash matching first (most reliable)
             if sha1:
-                local_rom = db.get_local_rom_by_hash(sha1)
+                local_rom = await _db(db.get_local_rom_by_hash, sha1)
                 if local_rom:
                     logger.info(f"ROM {rom_id} matched by SHA1 hash")
             
+            # Then CRC, for quick-scanned files
+            if not local_rom and crc:
+                candidates = await _db(db.get_local_roms_by_crc, crc)
+                local_rom = await _db(match_local_rom_by_crc, file_info, candidates)
+                if local_rom:
+                    logger.info(f"ROM {rom_id} matched by CRC32")
+            
             # Fallback to filename matching if no hash or no match
             if not local_rom and file_name:
                 logger.info(f"No hash match, trying filename match for: {file_name}")
                 # Get platform folder to search in
                 platform_name = rom.get('platform_display_name') or rom.get('platform_slug')
                 if platform_name:
-                    retrodeck_folder = config.get('platform_mapping', {}).get(platform_name)
+                    retrodeck_folder = platform_mapping.get(platform_name)
                     if retrodeck_folder:
                         # Query by platform and filename
-                        all_local = db.get_local_roms_by_platform(retrodeck_folder)
-                        for local in all_local:
-                            if local['file_name'] == file_name:
-                                local_rom = local
-                                logger.info(f"ROM {rom_id} matched by filename")
-                                break
+                        local_rom = await _db(db.get_local_rom_by_platform_and_filename, retrodeck_folder, file_name)
+                        if local_rom:
+                            logger.info(f"ROM {rom_id} matched by filename")
             
             rom['local_available'] = local_rom is not None
             if local_rom:
@@ -370,39 +602,62 @@ async def get_rom_details(rom_id: int):
 
 
 @app.post("/api/scan")
-async def scan_local_roms(request: ScanRequest, background_tasks: BackgroundTasks):
+async def scan_local_roms(request: ScanRequest):
     """Scan local ROM directories for the specified platforms"""
-    global scan_in_progress
+    platforms = list(dict.fromkeys(request.platforms))
     
-    if scan_in_progress:
-        raise HTTPException(status_code=409, detail="Scan already in progress")
+    # Folders we don't know the ROM extensions for can't be scanned
+    skipped = [platform for platform in platforms if not scanner.supports_platform(platform)]
+    if skipped:
+        logger.warning(f"Skipping platforms with no known ROM extensions: {', '.join(skipped)}")
+        platforms = [platform for platform in platforms if platform not in skipped]
+    if not platforms:
+        return {"status": "Nothing to scan", "platforms": [], "skipped": skipped}
+    if app.state.shutting_down:
+        raise HTTPException(status_code=503, detail="RommSync is shutting down")
     
-    def do_scan(platforms: List[str]):
-        global scan_in_progress
-        scan_in_progress = True
-        
+    # Only one scan per platform at a time; scans of other platforms are
+    # queued behind the running one
+    async with scan_lock:
+        already = scanning_platforms.intersection(platforms)
+        if already:
+            raise HTTPException(status_code=409,
+                                detail=f"Scan already in progress for: {', '.join(sorted(already))}")
+        scanning_platforms.update(platforms)
+    
+    def update_progress(platform: str, scanned: int, total: int):
+        scan_progress[platform] = {'scanned': scanned, 'total': total}
+    
+    def do_scan(platforms: List[str], scan_mode: str):
+        # Platforms only show progress once their scan actually starts
+        for platform in platforms:
+            scan_progress[platform] = {'scanned': 0, 'total': 0}
         try:
             import time
             start_time = time.time()
             
             logger.info(f"Starting scan of {len(platforms)} platforms")
             
-            for platform in platforms:
-                # Clear existing entries for this platform
-                db.clear_platform(platform)
-                
-                # Scan the directory
-                results = scanner.scan_platform(platform)
-                
-                # Store in database
-                for rom_info in results:
-                    db.add_local_rom(**rom_info)
-                
-                # Record scan
-                duration = time.time() - start_time
-                db.add_scan_record(platform, len(results), duration)
+            # Fingerprint just-downloaded ROMs too, so they aren't rehashed
+            db.flush()
+            
+            # Scan all directories together, rehashing only new or changed
+            # files; hashing is spread over one worker pool for all platforms
+            fingerprints = {platform: db.get_fingerprints(platform, require_sha1=scan_mode == 'full')
+                            for platform in platforms}
+            changes = scanner.scan_platforms_changes(fingerprints, scan_mode=scan_mode,
+                                                     platform_progress_callback=update_progress,
+                                                     stop_event=app.state.scan_stop)
+            if app.state.scan_stop.is_set():
+                logger.info("Scan stopped, results not saved")
+                return
+            
+            for platform, (results, missing, duration) in changes.items():
+                # Store in database, drop files that are gone and record the
+                # scan, all in one commit
+                db.save_scan_results(platform, results, missing, duration)
                 
-                logger.info(f"Scanned {platform}: {len(results)} files")
+                logger.info(f"Scanned {platform}: {len(results)} new or changed files, {len(missing)} removed")
             
             duration = time.time() - start_time
             logger.info(f"Scan completed in {duration:.2f} seconds")
@@ -410,31 +665,65 @@ async def scan_local_roms(request: ScanRequest, background_tasks: BackgroundTask
         except Exception as e:
             logger.error(f"Error during scan: {e}")
         finally:
-            scan_in_progress = False
+            for platform in platforms:
+                scan_progress.pop(platform, None)
+            scanning_platforms.difference_update(platforms)
     
-    background_tasks.add_task(do_scan, request.platforms)
+    app.state.scan_pool.submit(do_scan, platforms, request.scan_mode)
     
-    return {"status": "Scan started", "platforms": request.platforms}
+    return {"status": "Scan started", "platforms": platforms, "skipped": skipped}
+
+
+def scan_state() -> Dict:
+    """Snapshot of the running and queued scans"""
+    progress = dict(scan_progress)
+    return {
+        "in_progress": bool(scanning_platforms),
+        "platforms": sorted(progress),
+        "queued": sorted(scanning_platforms.difference(progress)),
+        "progress": progress
+    }
 
 
 @app.get("/api/scan/status")
 async def get_scan_status():
     """Get current scan status"""
-    stats = db.get_scan_stats()
+    await _db(db.flush)
+    stats = await _db(db.get_scan_stats)
     return {
-        "in_progress": scan_in_progress,
+        **scan_state(),
         "stats": stats
     }
 
 
+@app.get("/api/scan/events")
+async def scan_events():
+    """Stream scan progress as server-sent events until no scan is running"""
+    async def events():
+        last = None
+        while True:
+            state = scan_state()
+            if state != last:
+                yield b'data: ' + orjson.dumps(state) + b'\n\n'
+                last = state
+            if not state['in_progress']:
+                break
+            await asyncio.sleep(SCAN_EVENT_INTERVAL)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
 @app.post("/api/download")
-async def download_rom(request: DownloadRequest, background_tasks: BackgroundTasks):
+async def download_rom(request: DownloadRequest):
     """Download a ROM from ROMM to RetroDeck"""
     if not romm_client:
         raise HTTPException(status_code=503, detail="ROMM client not initialized")
+    if app.state.shutting_down:
+        raise HTTPException(status_code=503, detail="RommSync is shutting down")
     
     # Get ROM details
-    rom = romm_client.get_rom_by_id(request.rom_id)
+    rom = await romm_client.get_rom_by_id(request.rom_id)
     if not rom or 'files' not in rom or len(rom['files']) == 0:
         raise HTTPException(status_code=404, detail="ROM not found or has no files")
     
@@ -448,25 +737,38 @@ async def download_rom(request: DownloadRequest, background_tasks: BackgroundTas
     
     destination = platform_path / file_name
     
-    def do_download(rom_id: int, dest: Path, file_info: Dict, platform: str):
+    async def do_download(rom_id: int, dest: Path, file_info: Dict, platform: str):
+        started = success = False
         try:
-            logger.info(f"Downloading ROM {rom_id} to {dest}")
-            success = romm_client.download_rom(rom_id, str(dest))
+            # Wait for one of the download slots
+            async with app.state.download_slots:
+                logger.info(f"Downloading ROM {rom_id} to {dest}")
+                started = True
+                success = await romm_client.download_rom(rom_id, str(dest))
             
             if success:
-                # Add to local database
-                rom_info = scanner.quick_scan_file(dest)
+                # Add to local database, hashing on the download pool
+                loop = asyncio.get_running_loop()
+                rom_info = await loop.run_in_executor(app.state.download_pool, scanner.quick_scan_file, dest)
                 if rom_info:
                     rom_info['platform'] = platform
-                    db.add_local_rom(**rom_info)
+                    db.enqueue_rom(rom_info)
                     logger.info(f"Successfully downloaded and registered {file_name}")
             else:
                 logger.error(f"Failed to download ROM {rom_id}")
                 
+        except asyncio.CancelledError:
+            # Shutting down; don't leave a partial file behind
+            if started and not success:
+                dest.unlink(missing_ok=True)
+            logger.info(f"Cancelled download of ROM {rom_id}")
+            raise
         except Exception as e:
             logger.error(f"Error downloading ROM: {e}")
     
-    background_tasks.add_task(do_download, request.rom_id, destination, file_info, request.platform)
+    task = asyncio.create_task(do_download(request.rom_id, destination, file_info, request.platform))
+    app.state.downloads.add(task)
+    task.add_done_callback(app.state.downloads.discard)
     
     return {
         "status": "Download started",
@@ -482,30 +784,13 @@ async def generate_platform_mappings():
         raise HTTPException(status_code=503, detail="ROMM client not initialized")
     
     try:
-        platforms = romm_client.get_platforms()
-        
-        # Known mappings (same as generate_platform_mapping.py)
-        known_mappings = {
-            "Nintendo - Game Boy": "gb", "Nintendo - Game Boy Color": "gbc",
-            "Nintendo - Game Boy Advance": "gba", "Nintendo - Nintendo Entertainment System": "nes",
-            "Nintendo - Super Nintendo Entertainment System": "snes", "Nintendo - Nintendo 64": "n64",
-            "Nintendo - GameCube": "gc", "Nintendo - Wii": "wii", "Nintendo - Wii U": "wiiu",
-            "Nintendo - Nintendo DS": "nds", "Nintendo - Nintendo 3DS": "3ds", "Nintendo Switch": "switch",
-            "Sony - PlayStation": "psx", "Sony - PlayStation 2": "ps2", "Sony - PlayStation 3": "ps3",
-            "Sony - PlayStation Portable": "psp", "Sony - PlayStation Vita": "psvita",
-            "Sega - Master System": "mastersystem", "Sega - Mega Drive": "genesis",
-            "Sega - Game Gear": "gamegear", "Sega - Saturn": "saturn", "Sega - Dreamcast": "dreamcast",
-            "Atari 2600": "atari2600", "Atari 5200": "atari5200", "Atari 7800": "atari7800"
-        }
+        platforms = await romm_client.get_platforms()
         
         mappings = {}
         for platform in platforms:
             name = platform.get('name', '')
-            if name in known_mappings:
-                mappings[name] = known_mappings[name]
-            else:
-                slug = platform.get('slug', name.lower().replace(' ', '').replace('-', ''))
-                mappings[name] = slug
+            mappings[name] = (KNOWN_MAPPINGS.get(name) or platform.get('slug')
+                              or _SLUG_RE.sub('', name.lower()))
         
         return mappings
     except Exception as e:
@@ -516,13 +801,15 @@ async def generate_platform_mappings():
 @app.get("/api/stats")
 async def get_stats():
     """Get overall statistics"""
-    local_stats = db.get_scan_stats()
+    # Count just-downloaded ROMs too
+    await _db(db.flush)
+    local_stats = await _db(db.get_scan_stats)
     
     # Get ROMM stats
     romm_stats = {}
     if romm_client:
         try:
-            platforms = romm_client.get_platforms()
+            platforms = await romm_client.get_platforms()
             romm_stats = {
                 'total_platforms': len(platforms),
                 'platforms': platforms
@@ -569,4 +856,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Needed for the scanner's hashing process pool in the frozen AppImage
+    multiprocessing.freeze_support()
     main()
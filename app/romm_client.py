@@ -2,110 +2,242 @@
 ROMM API Client
 Handles all communication with the ROMM server
 """
-import requests
-from typing import List, Dict, Optional
+import asyncio
+import hashlib
+import httpx
+import time
+from typing import Any, Awaitable, Callable, List, Dict, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# How long ROMM responses are reused, in seconds, and how many are kept
+PLATFORM_CACHE_TTL = 60
+ROM_CACHE_TTL = 30
+CACHE_MAX_ENTRIES = 2048
+
+# Bytes read from the network and written to disk at a time when downloading
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
 
 class RommClient:
     def __init__(self, base_url: str, username: str, password: str):
         self.base_url = base_url.rstrip('/')
         self.username = username
         self.password = password
-        self.session = requests.Session()
-        self.session.auth = (username, password)
-        self._test_connection()
+        # One pooled HTTP/2 client, so concurrent requests share connections;
+        # ROMM's JSON compresses well, so ask for brotli or gzip
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            auth=(username, password),
+            headers={'Accept-Encoding': 'br, gzip'},
+            http2=True,
+            timeout=httpx.Timeout(30.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+        )
+        # Recent responses: key -> (expiry time, value)
+        self._cache = {}
+        # Digest of the last ROM list fetched per platform and how many times
+        # it has changed: platform_id -> (version, digest)
+        self._rom_lists = {}
+        self._created_at = time.time_ns()
+    
+    @classmethod
+    async def connect(cls, base_url: str, username: str, password: str) -> 'RommClient':
+        """Create a client and check that the ROMM server is reachable"""
+        client = cls(base_url, username, password)
+        try:
+            await client._test_connection()
+        except ConnectionError:
+            await client.close()
+            raise
+        return client
+    
+    def update_credentials(self, base_url: str, username: str, password: str):
+        """Point the client at new server details, keeping its connection pool"""
+        base_url = base_url.rstrip('/')
+        if (base_url, username, password) == (self.base_url, self.username, self.password):
+            return
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+        self.client.base_url = base_url
+        self.client.auth = (username, password)
+        # Responses may differ for another server or user
+        self.clear_cache()
+    
+    async def check_connection(self) -> bool:
+        """Test the connection, logging rather than raising on failure"""
+        try:
+            return await self._test_connection()
+        except ConnectionError:
+            return False
+    
+    async def close(self):
+        """Close the pooled connections"""
+        await self.client.aclose()
+    
+    def clear_cache(self):
+        """Forget all cached ROMM responses"""
+        self._cache.clear()
+    
+    async def _cached(self, key: tuple, ttl: float, fetch: Callable[[], Awaitable[Any]],
+                      keep: Callable[[Any], bool] = bool) -> Any:
+        """Return a cached response for key, or fetch it and cache it if keep(value)"""
+        now = time.monotonic()
+        hit = self._cache.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+        
+        value = await fetch()
+        # By default, don't cache failures (None or an empty list)
+        if keep(value):
+            if len(self._cache) >= CACHE_MAX_ENTRIES:
+                # Evict the oldest entry
+                del self._cache[next(iter(self._cache))]
+            self._cache.pop(key, None)
+            self._cache[key] = (now + ttl, value)
+        return value
     
-    def _test_connection(self):
+    async def _test_connection(self):
         """Test connection to ROMM server"""
         try:
-            response = self.session.get(f"{self.base_url}/api/platforms", timeout=5)
+            response = await self.client.get("/api/platforms", timeout=5)
             response.raise_for_status()
             logger.info(f"Successfully connected to ROMM at {self.base_url}")
             return True
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Failed to connect to ROMM: {e}")
             raise ConnectionError(f"Cannot connect to ROMM server at {self.base_url}: {e}")
     
-    def get_platforms(self) -> List[Dict]:
+    async def get_platforms(self) -> List[Dict]:
         """Get all platforms from ROMM"""
+        return await self._cached(('platforms',), PLATFORM_CACHE_TTL, self._fetch_platforms)
+    
+    async def _fetch_platforms(self) -> List[Dict]:
         try:
-            response = self.session.get(f"{self.base_url}/api/platforms")
+            response = await self.client.get("/api/platforms")
             response.raise_for_status()
             platforms = response.json()
             logger.info(f"Retrieved {len(platforms)} platforms from ROMM")
             return platforms
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error getting platforms: {e}")
             return []
     
-    def get_platform_by_id(self, platform_id: int) -> Optional[Dict]:
+    async def get_platform_by_id(self, platform_id: int) -> Optional[Dict]:
         """Get a specific platform by ID"""
+        return await self._cached(('platform', platform_id), PLATFORM_CACHE_TTL,
+                                  lambda: self._fetch_platform_by_id(platform_id))
+    
+    async def _fetch_platform_by_id(self, platform_id: int) -> Optional[Dict]:
         try:
-            response = self.session.get(f"{self.base_url}/api/platforms/{platform_id}")
+            response = await self.client.get(f"/api/platforms/{platform_id}")
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error getting platform {platform_id}: {e}")
             return None
     
-    def get_roms_by_platform(self, platform_id: int) -> List[Dict]:
+    async def get_roms_by_platform(self, platform_id: int) -> List[Dict]:
         """Get all ROMs for a specific platform (with pagination)"""
+        # Only complete lists are cached
+        roms, _ = await self._cached(('roms', platform_id), ROM_CACHE_TTL,
+                                     lambda: self._fetch_roms_by_platform(platform_id),
+                                     keep=lambda result: result[1])
+        return roms
+    
+    def rom_list_version(self, platform_id: int) -> str:
+        """Token that changes whenever a platform's fetched ROM list changes"""
+        version, _ = self._rom_lists.get(platform_id, (0, None))
+        return f"{self._created_at}.{platform_id}.{version}"
+    
+    def _note_rom_list(self, platform_id: int, digest: bytes):
+        """Remember a fetched ROM list's digest, bumping its version if it changed"""
+        version, previous = self._rom_lists.get(platform_id, (0, None))
+        if digest != previous:
+            self._rom_lists[platform_id] = (version + 1, digest)
+    
+    async def _fetch_roms_by_platform(self, platform_id: int) -> Tuple[List[Dict], bool]:
+        """Fetch a platform's ROMs, and whether every page was retrieved"""
         all_roms = []
         limit = 1000
-        offset = 0
+        # Hash of the raw pages, in order, to tell when the list changes
+        digest = hashlib.sha1()
         
         try:
-            while True:
-                params = {
-                    'platform_ids': platform_id,
-                    'limit': limit,
-                    'offset': offset
-                }
-                response = self.session.get(f"{self.base_url}/api/roms", params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                # ROMM returns paginated response with 'items' key
-                roms = data.get('items', []) if isinstance(data, dict) else data
-                
-                if not roms:
-                    # No more ROMs to fetch
-                    break
-                
-                all_roms.extend(roms)
-                
-                # Check if we got fewer than limit (means we're at the end)
-                if len(roms) < limit:
-                    break
-                
-                # Move to next page
-                offset += limit
-                logger.debug(f"Fetching next page: offset={offset}")
+            # The first page tells us how many ROMs there are in total
+            data, content = await self._get_roms_page(platform_id, limit, 0)
+            digest.update(content)
+            
+            # ROMM returns paginated response with 'items' key
+            roms = data.get('items', []) if isinstance(data, dict) else data
+            all_roms.extend(roms)
+            total = data.get('total') if isinstance(data, dict) else None
+            
+            if total is not None:
+                # Fetch all remaining pages at once
+                offsets = range(limit, total, limit)
+                logger.debug(f"Fetching {len(offsets)} more pages for platform {platform_id}")
+                pages = await asyncio.gather(
+                    *(self._get_roms_page(platform_id, limit, offset) for offset in offsets),
+                    return_exceptions=True
+                )
+                for page in pages:
+                    if isinstance(page, BaseException):
+                        raise page
+                    page, content = page
+                    digest.update(content)
+                    all_roms.extend(page.get('items', []))
+            else:
+                # No total reported: page until we get fewer than limit
+                offset = 0
+                while len(roms) == limit:
+                    offset += limit
+                    logger.debug(f"Fetching next page: offset={offset}")
+                    data, content = await self._get_roms_page(platform_id, limit, offset)
+                    digest.update(content)
+                    roms = data.get('items', []) if isinstance(data, dict) else data
+                    all_roms.extend(roms)
             
             logger.info(f"Retrieved {len(all_roms)} ROMs for platform {platform_id}")
-            return all_roms
-        except requests.exceptions.RequestException as e:
+            complete = True
+        except httpx.HTTPError as e:
             logger.error(f"Error getting ROMs for platform {platform_id}: {e}")
-            return all_roms  # Return what we got so far
+            complete = False  # Return what we got so far
+        
+        self._note_rom_list(platform_id, digest.digest())
+        return all_roms, complete
+    
+    async def _get_roms_page(self, platform_id: int, limit: int, offset: int) -> Tuple[Any, bytes]:
+        """Get one page of a platform's ROMs, with its raw response body"""
+        params = {
+            'platform_ids': platform_id,
+            'limit': limit,
+            'offset': offset
+        }
+        response = await self.client.get("/api/roms", params=params)
+        response.raise_for_status()
+        return response.json(), response.content
     
-    def get_rom_by_id(self, rom_id: int) -> Optional[Dict]:
+    async def get_rom_by_id(self, rom_id: int) -> Optional[Dict]:
         """Get detailed information about a specific ROM"""
+        return await self._cached(('rom', rom_id), ROM_CACHE_TTL, lambda: self._fetch_rom_by_id(rom_id))
+    
+    async def _fetch_rom_by_id(self, rom_id: int) -> Optional[Dict]:
         try:
-            response = self.session.get(f"{self.base_url}/api/roms/{rom_id}")
+            response = await self.client.get(f"/api/roms/{rom_id}")
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error getting ROM {rom_id}: {e}")
             return None
     
-    def download_rom(self, rom_id: int, destination_path: str) -> bool:
+    async def download_rom(self, rom_id: int, destination_path: str) -> bool:
         """Download a ROM file to the specified path"""
         try:
             # Get ROM details to find the file
-            rom = self.get_rom_by_id(rom_id)
+            rom = await self.get_rom_by_id(rom_id)
             if not rom or 'files' not in rom or len(rom['files']) == 0:
                 logger.error(f"ROM {rom_id} has no files")
                 return False
@@ -116,31 +248,32 @@ class RommClient:
             file_id = file_info['id']
             
             # Download endpoint - this might vary, check your ROMM API docs
-            download_url = f"{self.base_url}/api/roms/{rom_id}/content/{file_id}"
+            download_url = f"/api/roms/{rom_id}/content/{file_id}"
             
             logger.info(f"Downloading ROM {rom_id} to {destination_path}")
             
-            response = self.session.get(download_url, stream=True)
-            response.raise_for_status()
-            
-            # Write file in chunks
-            with open(destination_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            # No overall timeout: large ROMs can take a long while
+            async with self.client.stream("GET", download_url, timeout=httpx.Timeout(30.0, read=None)) as response:
+                response.raise_for_status()
+                
+                # Write file in large chunks, off the event loop
+                with open(destination_path, 'wb') as f:
+                    async for chunk in response.aiter_bytes(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        await asyncio.to_thread(f.write, chunk)
             
             logger.info(f"Successfully downloaded ROM to {destination_path}")
             return True
-            
-        except requests.exceptions.RequestException as e:
+        
+        except httpx.HTTPError as e:
             logger.error(f"Error downloading ROM {rom_id}: {e}")
             return False
         except Exception as e:
             logger.error(f"Unexpected error downloading ROM {rom_id}: {e}")
             return False
     
-    def get_rom_cover_url(self, rom_id: int) -> Optional[str]:
+    async def get_rom_cover_url(self, rom_id: int) -> Optional[str]:
         """Get the cover art URL for a ROM"""
-        rom = self.get_rom_by_id(rom_id)
+        rom = await self.get_rom_by_id(rom_id)
         if rom and 'cover' in rom and rom['cover']:
             # ROMM typically serves covers at /assets/romm/resources/...
             cover_path = rom['cover'].get('path_cover_l') or rom['cover'].get('path_cover_s')
@@ -148,16 +281,16 @@ class RommClient:
                 return f"{self.base_url}{cover_path}"
         return None
     
-    def search_roms(self, query: str, platform_id: Optional[int] = None) -> List[Dict]:
+    async def search_roms(self, query: str, platform_id: Optional[int] = None) -> List[Dict]:
         """Search for ROMs by name"""
         try:
             params = {'search_term': query}
             if platform_id:
                 params['platform_id'] = platform_id
             
-            response = self.session.get(f"{self.base_url}/api/roms", params=params)
+            response = await self.client.get("/api/roms", params=params)
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error searching ROMs: {e}")
             return []
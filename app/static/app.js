@@ -37,6 +37,8 @@ const elements = {
     detailPosition: document.getElementById('detail-position'),
     detailDownloadBtn: document.getElementById('detail-download-btn'),
     scanModal: document.getElementById('scan-modal'),
+    scanProgress: document.getElementById('scan-progress'),
+    scanStatusText: document.getElementById('scan-status-text'),
     localCount: document.getElementById('local-count'),
     rommCount: document.getElementById('romm-count'),
     scanStatus: document.getElementById('scan-status'),
@@ -355,26 +357,38 @@ async function scanLocalRoms() {
             return;
         }
         
+        updateScanProgress({}, []);
         elements.scanModal.classList.remove('hidden');
         
-        await postAPI('/api/scan', { platforms: platformsToScan });
+        const started = await postAPI('/api/scan', { platforms: platformsToScan });
         
-        // Poll for scan completion
-        const pollInterval = setInterval(async () => {
-            try {
-                const status = await fetchAPI('/api/scan/status');
-                
-                if (!status.in_progress) {
-                    clearInterval(pollInterval);
-                    elements.scanModal.classList.add('hidden');
-                    await loadStats();
-                    await loadPlatforms();
-                    showError('✓ Scan completed successfully!', true);
-                }
-            } catch (error) {
-                console.error('Error polling scan status:', error);
+        if (started.skipped.length > 0) {
+            showError(`Skipped folders with no known ROM types: ${started.skipped.join(', ')}`);
+        }
+        if (started.platforms.length === 0) {
+            elements.scanModal.classList.add('hidden');
+            return;
+        }
+        
+        // Follow scan progress until it completes
+        const events = new EventSource(`${API_BASE}/api/scan/events`);
+        events.onmessage = async (event) => {
+            const status = JSON.parse(event.data);
+            
+            if (!status.in_progress) {
+                events.close();
+                elements.scanModal.classList.add('hidden');
+                await loadStats();
+                await loadPlatforms();
+                showError('✓ Scan completed successfully!', true);
+                return;
             }
-        }, 2000);
+            
+            updateScanProgress(status.progress, status.queued);
+        };
+        events.onerror = (error) => {
+            console.error('Error following scan progress:', error);
+        };
         
     } catch (error) {
         showError('Failed to start scan');
@@ -383,6 +397,28 @@ async function scanLocalRoms() {
     }
 }
 
+function updateScanProgress(progress, queued) {
+    let scanned = 0;
+    let total = 0;
+    for (const counts of Object.values(progress)) {
+        scanned += counts.scanned;
+        total += counts.total;
+    }
+    
+    const percent = total > 0 ? Math.round((scanned / total) * 100) : 0;
+    elements.scanProgress.style.width = `${percent}%`;
+    let text = total > 0
+        ? `Scanned ${scanned} of ${total} files...`
+        : 'Initializing scan...';
+    if (queued.length > 0) {
+        // Scans run one at a time; these wait for the current one
+        text = Object.keys(progress).length > 0
+            ? `${text} (${queued.length} more queued)`
+            : 'Waiting for the current scan to finish...';
+    }
+    elements.scanStatusText.textContent = text;
+}
+
 // Render Functions
 function renderPlatforms(searchTerm = '') {
     const filtered = platforms.filter(p => 
@@ -84,6 +84,7 @@ a = Analysis(
         "uvicorn.protocols.websockets.auto",
         "uvicorn.lifespan",
         "uvicorn.lifespan.on",
+        "h2",
     ],
     hookspath=[],
     hooksconfig={},